@@ -9,7 +9,7 @@ import os
 import re
 import shutil
 import stat
-from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple
 
 import archspec
 
@@ -56,6 +56,33 @@ def _flatten_dict(dictionary: Mapping[str, object]) -> Iterable[str]:
             yield f"{key}={item}"
 
 
+@functools.lru_cache(maxsize=None)
+def _host_cpu_family() -> str:
+    """Cached name of the host CPU family.
+
+    Host CPU detection parses e.g. /proc/cpuinfo on every call, and its result
+    cannot change within a process.
+    """
+    return archspec.cpu.host().family.name
+
+
+@functools.lru_cache(maxsize=1)
+def _installed_python_by_prefix(
+    query: Callable[[str], List[spack.spec.Spec]], db_index_verifier: str
+) -> Dict[str, spack.spec.Spec]:
+    """Map installation prefixes to installed python specs.
+
+    The result is cached on the database query method and its index verifier, so
+    the map is rebuilt whenever the database index or the database itself change.
+    This avoids a linear scan of all installed pythons for every external python
+    extension in a DAG.
+    """
+    result: Dict[str, spack.spec.Spec] = {}
+    for s in query("python"):
+        result.setdefault(str(s.prefix), s)
+    return result
+
+
 class PythonExtension(spack.package_base.PackageBase):
     @property
     def import_modules(self) -> Iterable[str]:
@@ -274,7 +301,7 @@ class PythonExtension(spack.package_base.PackageBase):
                         if not python.architecture.os:
                             python.architecture.os = "default_os"
                         if not python.architecture.target:
-                            python.architecture.target = archspec.cpu.host().family.name
+                            python.architecture.target = _host_cpu_family()
 
                     # Ensure compiler information is present
                     if not python.compiler:
@@ -296,11 +323,12 @@ class PythonExtension(spack.package_base.PackageBase):
         Returns:
           spack.spec.Spec: The external Spec for python most likely to be compatible with self.spec
         """
-        python_externals_installed = [
-            s for s in spack.store.STORE.db.query("python") if s.prefix == self.spec.external_path
-        ]
-        if python_externals_installed:
-            return python_externals_installed[0]
+        db = spack.store.STORE.db
+        python_external_installed = _installed_python_by_prefix(
+            db.query, db.last_seen_verifier
+        ).get(self.spec.external_path)
+        if python_external_installed:
+            return python_external_installed
 
         python_external_config = spack.config.get("packages:python:externals", [])
         python_externals_configured = [
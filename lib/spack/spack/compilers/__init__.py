@@ -680,7 +680,7 @@ class CompilerConfigFactory:
     @staticmethod
     def from_specs(specs: List["spack.spec.Spec"]) -> List[dict]:
         result = []
-        compiler_package_names = supported_compilers() + list(package_name_to_compiler_name.keys())
+        compiler_package_names = set(supported_compilers()).union(package_name_to_compiler_name)
         for s in specs:
             if s.name not in compiler_package_names:
                 continue
@@ -695,7 +695,7 @@ class CompilerConfigFactory:
     @staticmethod
     def from_packages_yaml(packages_yaml) -> List[dict]:
         compiler_specs = []
-        compiler_package_names = supported_compilers() + list(package_name_to_compiler_name.keys())
+        compiler_package_names = set(supported_compilers()).union(package_name_to_compiler_name)
         for name, entry in packages_yaml.items():
             if name not in compiler_package_names:
                 continue
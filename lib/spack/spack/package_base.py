@@ -338,12 +338,10 @@ def on_package_attributes(**attr_dict):
         @functools.wraps(func)
         def _wrapper(instance, *args, **kwargs):
             # If all the attributes have the value we require, then execute
-            has_all_attributes = all([hasattr(instance, key) for key in attr_dict])
+            has_all_attributes = all(hasattr(instance, key) for key in attr_dict)
             if has_all_attributes:
                 has_the_right_values = all(
-                    [
-                        getattr(instance, key) == value for key, value in attr_dict.items()
-                    ]  # NOQA: ignore=E501
+                    getattr(instance, key) == value for key, value in attr_dict.items()
                 )
                 if has_the_right_values:
                     func(instance, *args, **kwargs)
@@ -61,6 +61,11 @@ properties: Dict[str, Any] = {
             "unify": {
                 "oneOf": [{"type": "boolean"}, {"type": "string", "enum": ["when_possible"]}]
             },
+            "solve": {
+                "type": "object",
+                "additionalProperties": False,
+                "properties": {"preferred_first": {"type": "boolean"}},
+            },
             "splice": {
                 "type": "object",
                 "additionalProperties": False,
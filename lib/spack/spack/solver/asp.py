@@ -7,6 +7,7 @@ import collections.abc
 import copy
 import enum
 import functools
+import io
 import itertools
 import os
 import pathlib
@@ -17,7 +18,19 @@ import types
 import typing
 import warnings
 from contextlib import contextmanager
-from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple, Type, Union
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
 
 import archspec.cpu
 
@@ -61,7 +74,6 @@ from .core import (
     extract_args,
     fn,
     parse_files,
-    parse_term,
 )
 from .counter import FullDuplicatesCounter, MinimalDuplicatesCounter, NoDuplicatesCounter
 from .version_order import concretization_version_order
@@ -73,6 +85,10 @@ TransformFunction = Callable[["spack.spec.Spec", List[AspFunction]], List[AspFun
 #: Enable the addition of a runtime node
 WITH_RUNTIME = sys.platform != "win32"
 
+#: Anonymous, unconstrained spec, used to check whether a condition is trivial.
+#: Only ever compare against this spec, never mutate it.
+_EMPTY_SPEC = spack.spec.Spec()
+
 #: Data class that contain configuration on what a
 #: clingo solve should output.
 #:
@@ -279,7 +295,7 @@ def specify(spec):
 
 def remove_node(spec: spack.spec.Spec, facts: List[AspFunction]) -> List[AspFunction]:
     """Transformation that removes all "node" and "virtual_node" from the input list of facts."""
-    return list(filter(lambda x: x.args[0] not in ("node", "virtual_node"), facts))
+    return [x for x in facts if x.args[0] not in ("node", "virtual_node")]
 
 
 def _create_counter(specs: List[spack.spec.Spec], tests: bool):
@@ -544,14 +560,14 @@ class Result:
         each one show the associated candidate spec from the solver (if
         there is one).
         """
-        msg = "Unsatisfied input specs:"
+        parts = ["Unsatisfied input specs:"]
         for input_spec, candidate in unsolved_specs:
-            msg += f"\n\tInput spec: {str(input_spec)}"
+            parts.append(f"\tInput spec: {input_spec}")
             if candidate:
-                msg += f"\n\tCandidate spec: {str(candidate)}"
+                parts.append(f"\tCandidate spec: {candidate}")
             else:
-                msg += "\n\t(No candidate specs from solver)"
-        return msg
+                parts.append("\t(No candidate specs from solver)")
+        return "\n".join(parts)
 
 
 def _normalize_packages_yaml(packages_yaml):
@@ -595,8 +611,54 @@ def _is_checksummed_version(version_info: Tuple[GitOrStandardVersion, dict]):
     return _is_checksummed_git_version(version)
 
 
+@llnl.util.lang.memoized
+def _target_range_bitsets() -> Tuple[Tuple, Dict[str, int], Dict[str, int]]:
+    """Bitsets over the known archspec targets, to filter target ranges quickly.
+
+    Returns a tuple of all targets, plus two dicts mapping a target name to the
+    bitset of targets that are respectively >= and <= that target, with bit i
+    referring to the i-th entry of the targets tuple.
+    """
+    targets = tuple(archspec.cpu.TARGETS.values())
+    at_least, at_most = {}, {}
+    for target in targets:
+        ge_mask = le_mask = 0
+        for idx, other in enumerate(targets):
+            if target <= other:
+                ge_mask |= 1 << idx
+            if target >= other:
+                le_mask |= 1 << idx
+        at_least[target.name] = ge_mask
+        at_most[target.name] = le_mask
+    return targets, at_least, at_most
+
+
+def _sorted_package_py_versions(pkg_cls) -> List[Tuple[GitOrStandardVersion, dict]]:
+    """Versions from the package.py file, sorted by concretization preference.
+
+    The result is cached on the package class, since versions rarely change within
+    a process while environments concretize the same packages over and over.
+    """
+    cached = pkg_cls.__dict__.get("_sorted_versions_cache")
+    # compare against a snapshot of the versions dict, so that any mutation - added
+    # or removed versions, but also changed info for an existing version - rebuilds
+    # the sorted list; the comparison is still much cheaper than re-sorting
+    if cached is None or cached[0] != pkg_cls.versions:
+        cached = (
+            dict(pkg_cls.versions),
+            sorted(pkg_cls.versions.items(), key=concretization_version_order, reverse=True),
+        )
+        pkg_cls._sorted_versions_cache = cached
+    return cached[1]
+
+
+@llnl.util.lang.memoized
 def _spec_with_default_name(spec_str, name):
-    """Return a spec with a default name if none is provided, used for requirement specs"""
+    """Return a spec with a default name if none is provided, used for requirement specs.
+
+    Parsing is memoized, since the same requirement strings are seen on every solve in a
+    session. Callers must not mutate the returned spec.
+    """
     spec = spack.spec.Spec(spec_str)
     if not spec.name:
         spec.name = name
@@ -1127,7 +1189,7 @@ class ConditionContext(SourceContext):
 class SpackSolverSetup:
     """Class to set up and run a Spack concretization solve."""
 
-    def __init__(self, tests: bool = False):
+    def __init__(self, tests: bool = False, reduced: bool = False):
         # these are all initialized in setup()
         self.gen: "ProblemInstanceBuilder" = ProblemInstanceBuilder()
         self.possible_virtuals: Set[str] = set()
@@ -1151,6 +1213,11 @@ class SpackSolverSetup:
 
         self.reusable_and_possible: ConcreteSpecsByHash = ConcreteSpecsByHash()
 
+        # facts already formatted for reusable concrete specs, by dag hash. A
+        # concrete spec's clauses cannot change, and in multi-round solves the
+        # same reusable specs are passed to setup() over and over.
+        self._concrete_facts_cache: Dict[str, str] = {}
+
         self._id_counter: Iterator[int] = itertools.count()
         self._trigger_cache: ConditionSpecCache = collections.defaultdict(dict)
         self._effect_cache: ConditionSpecCache = collections.defaultdict(dict)
@@ -1164,16 +1231,31 @@ class SpackSolverSetup:
         # If False allows for input specs that are not solved
         self.concretize_everything = True
 
+        # If True emit a reduced universe of facts (e.g. host-compatible targets
+        # only). Grounding scales with the number of facts, so this speeds up the
+        # solve considerably. An unsatisfiable reduced problem doesn't mean the
+        # full problem is unsatisfiable, so callers must fall back to a full setup.
+        self.reduced = reduced
+
         # Set during the call to setup
         self.pkgs: Set[str] = set()
+        self.sorted_pkgs: List[str] = []
         self.explicitly_required_namespaces: Dict[str, str] = {}
 
         # list of unique libc specs targeted by compilers (or an educated guess if no compiler)
         self.libcs: List[spack.spec.Spec] = []
 
+        # (name, version) pairs for self.libcs, so hot loops in _spec_clauses don't
+        # re-read those properties for every spec
+        self.libc_attrs: List[Tuple[str, GitOrStandardVersion]] = []
+
         # If true, we have to load the code for synthesizing splices
         self.enable_splicing: bool = spack.config.CONFIG.get("concretizer:splice:automatic")
 
+        # Memoized within a single setup, since virtual-ness of a name cannot change
+        # during a solve and the repo check is comparatively expensive
+        self._is_virtual = functools.lru_cache(maxsize=None)(spack.repo.PATH.is_virtual)
+
     def pkg_version_rules(self, pkg):
         """Output declared versions of a package.
 
@@ -1247,13 +1329,13 @@ class SpackSolverSetup:
                 conflict_spec = spack.spec.Spec(conflict_spec)
                 if conflict_msg is None:
                     conflict_msg = f"{pkg.name}: "
-                    if when_spec == spack.spec.Spec():
+                    if when_spec == _EMPTY_SPEC:
                         conflict_msg += f"conflicts with '{conflict_spec}'"
                     else:
                         conflict_msg += f"'{conflict_spec}' conflicts with '{when_spec}'"
 
                 spec_for_msg = conflict_spec
-                if conflict_spec == spack.spec.Spec():
+                if conflict_spec == _EMPTY_SPEC:
                     spec_for_msg = spack.spec.Spec(pkg.name)
                 conflict_spec_msg = f"conflict is triggered when {str(spec_for_msg)}"
                 conflict_spec_id = self.condition(
@@ -1271,7 +1353,7 @@ class SpackSolverSetup:
     def package_languages(self, pkg):
         for when_spec, languages in pkg.languages.items():
             condition_msg = f"{pkg.name} needs the {', '.join(sorted(languages))} language"
-            if when_spec != spack.spec.Spec():
+            if when_spec != _EMPTY_SPEC:
                 condition_msg += f" when {when_spec}"
             condition_id = self.condition(when_spec, required_name=pkg.name, msg=condition_msg)
             for language in sorted(languages):
@@ -1408,7 +1490,7 @@ class SpackSolverSetup:
         # used to find a variant id from its variant definition (for variant values on specs)
         self.variant_ids_by_def_id[id(variant_def)] = vid
 
-        if when == spack.spec.Spec():
+        if when == _EMPTY_SPEC:
             # unconditional variant
             pkg_fact(fn.variant_definition(name, vid))
         else:
@@ -1658,7 +1740,7 @@ class SpackSolverSetup:
                     continue
 
                 msg = f"{pkg.name} depends on {dep.spec}"
-                if cond != spack.spec.Spec():
+                if cond != _EMPTY_SPEC:
                     msg += f" when {cond}"
                 else:
                     pass
@@ -1816,7 +1898,7 @@ class SpackSolverSetup:
             requirement_weight = 0
 
             # Write explicitly if a requirement is conditional or not
-            if rule.condition != spack.spec.Spec():
+            if rule.condition != _EMPTY_SPEC:
                 msg = f"condition to activate requirement {requirement_grp_id}"
                 try:
                     main_condition_id = self.condition(
@@ -2001,9 +2083,11 @@ class SpackSolverSetup:
             try:
                 variant_defs = vt.prevalidate_variant_value(self.pkg_class(pkg_name), variant)
             except (vt.InvalidVariantValueError, KeyError, ValueError) as e:
-                tty.debug(
-                    f"[SETUP]: rejected {str(variant)} as a preference for {pkg_name}: {str(e)}"
-                )
+                if tty.is_debug():
+                    tty.debug(
+                        f"[SETUP]: rejected {str(variant)} as a preference for "
+                        f"{pkg_name}: {str(e)}"
+                    )
                 continue
 
             for value in variant.value_as_tuple:
@@ -2094,10 +2178,17 @@ class SpackSolverSetup:
 
         f: Union[Type[_Head], Type[_Body]] = _Body if body else _Head
 
-        if spec.name:
-            clauses.append(f.node(spec.name) if not spec.virtual else f.virtual_node(spec.name))
+        # This function is called once per spec in the solve, and for large
+        # problems the repeated attribute lookups below are measurable. Bind
+        # the hottest ones to locals.
+        append = clauses.append
+        attr = fn.attr
+        spec_name = spec.name
+
+        if spec_name:
+            append(f.node(spec_name) if not spec.virtual else f.virtual_node(spec_name))
         if spec.namespace:
-            clauses.append(f.namespace(spec.name, spec.namespace))
+            append(f.namespace(spec_name, spec.namespace))
 
         clauses.extend(self.spec_versions(spec))
 
@@ -2106,9 +2197,9 @@ class SpackSolverSetup:
         arch = spec.architecture
         if arch:
             if arch.platform:
-                clauses.append(f.node_platform(spec.name, arch.platform))
+                append(f.node_platform(spec_name, arch.platform))
             if arch.os:
-                clauses.append(f.node_os(spec.name, arch.os))
+                append(f.node_os(spec_name, arch.os))
             if arch.target:
                 clauses.extend(self.target_ranges(spec, f.node_target))
 
@@ -2120,41 +2211,43 @@ class SpackSolverSetup:
             if variant.value == ("*",):
                 continue
 
-            for value in variant.value_as_tuple:
-                # ensure that the value *can* be valid for the spec
-                if spec.name and not spec.concrete and not spec.virtual:
-                    variant_defs = vt.prevalidate_variant_value(
-                        self.pkg_class(spec.name), variant, spec
-                    )
+            # ensure that the values *can* be valid for the spec. The check does not
+            # depend on the individual values, so do it once per variant.
+            variant_defs = []
+            if spec_name and not spec.concrete and not spec.virtual:
+                variant_defs = vt.prevalidate_variant_value(
+                    self.pkg_class(spec_name), variant, spec
+                )
 
-                    # Record that that this is a valid possible value. Accounts for
-                    # int/str/etc., where valid values can't be listed in the package
-                    for variant_def in variant_defs:
-                        self.variant_values_from_specs.add((spec.name, id(variant_def), value))
+            for value in variant.value_as_tuple:
+                # Record that this is a valid possible value. Accounts for
+                # int/str/etc., where valid values can't be listed in the package
+                for variant_def in variant_defs:
+                    self.variant_values_from_specs.add((spec_name, id(variant_def), value))
 
                 if variant.propagate:
-                    clauses.append(f.propagate(spec.name, fn.variant_value(vname, value)))
-                    if self.pkg_class(spec.name).has_variant(vname):
-                        clauses.append(f.variant_value(spec.name, vname, value))
+                    append(f.propagate(spec_name, fn.variant_value(vname, value)))
+                    if self.pkg_class(spec_name).has_variant(vname):
+                        append(f.variant_value(spec_name, vname, value))
                 else:
-                    clauses.append(f.variant_value(spec.name, vname, value))
+                    append(f.variant_value(spec_name, vname, value))
 
         # compiler and compiler version
         if spec.compiler:
-            clauses.append(f.node_compiler(spec.name, spec.compiler.name))
+            append(f.node_compiler(spec_name, spec.compiler.name))
 
             if spec.compiler.concrete:
-                clauses.append(
-                    f.node_compiler_version(spec.name, spec.compiler.name, spec.compiler.version)
+                append(
+                    f.node_compiler_version(spec_name, spec.compiler.name, spec.compiler.version)
                 )
 
             elif spec.compiler.versions and spec.compiler.versions != vn.any_version:
                 # The condition above emits a facts only if we have an actual constraint
                 # on the compiler version, and avoids emitting them if any version is fine
-                clauses.append(
-                    fn.attr(
+                append(
+                    attr(
                         "node_compiler_version_satisfies",
-                        spec.name,
+                        spec_name,
                         spec.compiler.name,
                         spec.compiler.versions,
                     )
@@ -2166,13 +2259,11 @@ class SpackSolverSetup:
         for flag_type, flags in spec.compiler_flags.items():
             flag_group = " ".join(flags)
             for flag in flags:
-                clauses.append(
-                    f.node_flag(spec.name, fn.node_flag(flag_type, flag, flag_group, source))
-                )
+                append(f.node_flag(spec_name, fn.node_flag(flag_type, flag, flag_group, source)))
                 if not spec.concrete and flag.propagate is True:
-                    clauses.append(
+                    append(
                         f.propagate(
-                            spec.name,
+                            spec_name,
                             fn.node_flag(flag_type, flag, flag_group, source),
                             fn.edge_types("link", "run"),
                         )
@@ -2183,23 +2274,23 @@ class SpackSolverSetup:
             # older specs do not have package hashes, so we have to do this carefully
             package_hash = getattr(spec, "_package_hash", None)
             if package_hash:
-                clauses.append(fn.attr("package_hash", spec.name, package_hash))
-            clauses.append(fn.attr("hash", spec.name, spec.dag_hash()))
+                append(attr("package_hash", spec_name, package_hash))
+            append(attr("hash", spec_name, spec.dag_hash()))
 
         edges = spec.edges_from_dependents()
         virtuals = [x for x in itertools.chain.from_iterable([edge.virtuals for edge in edges])]
         if not body:
             for virtual in virtuals:
-                clauses.append(fn.attr("provider_set", spec.name, virtual))
-                clauses.append(fn.attr("virtual_node", virtual))
+                append(attr("provider_set", spec_name, virtual))
+                append(attr("virtual_node", virtual))
         else:
             for virtual in virtuals:
-                clauses.append(fn.attr("virtual_on_incoming_edges", spec.name, virtual))
+                append(attr("virtual_on_incoming_edges", spec_name, virtual))
 
         # If the spec is external and concrete, we allow all the libcs on the system
         if spec.external and spec.concrete and using_libc_compatibility():
-            for libc in self.libcs:
-                clauses.append(fn.attr("compatible_libc", spec.name, libc.name, libc.version))
+            for libc_name, libc_version in self.libc_attrs:
+                append(attr("compatible_libc", spec_name, libc_name, libc_version))
 
         # add all clauses from dependencies
         if transitive:
@@ -2216,11 +2307,9 @@ class SpackSolverSetup:
                     # libc is also solved again by clingo, but in this case the compatibility
                     # is not encoded in the parent node - so we need to emit explicit facts
                     if "libc" in dspec.virtuals:
-                        for libc in self.libcs:
+                        for libc, (libc_name, libc_version) in zip(self.libcs, self.libc_attrs):
                             if libc_is_compatible(libc, dep):
-                                clauses.append(
-                                    fn.attr("compatible_libc", spec.name, libc.name, libc.version)
-                                )
+                                append(attr("compatible_libc", spec_name, libc_name, libc_version))
                         continue
 
                     # We know dependencies are real for concrete specs. For abstract
@@ -2230,21 +2319,17 @@ class SpackSolverSetup:
                             continue
                         # skip build dependencies of already-installed specs
                         if concrete_build_deps or dtype != dt.BUILD:
-                            clauses.append(
-                                fn.attr(
-                                    "depends_on", spec.name, dep.name, dt.flag_to_string(dtype)
-                                )
+                            append(
+                                attr("depends_on", spec_name, dep.name, dt.flag_to_string(dtype))
                             )
                             for virtual_name in dspec.virtuals:
-                                clauses.append(
-                                    fn.attr("virtual_on_edge", spec.name, dep.name, virtual_name)
-                                )
-                                clauses.append(fn.attr("virtual_node", virtual_name))
+                                append(attr("virtual_on_edge", spec_name, dep.name, virtual_name))
+                                append(attr("virtual_node", virtual_name))
 
                     # imposing hash constraints for all but pure build deps of
                     # already-installed concrete specs.
                     if concrete_build_deps or dspec.depflag != dt.BUILD:
-                        clauses.append(fn.attr("hash", dep.name, dep.dag_hash()))
+                        append(attr("hash", dep.name, dep.dag_hash()))
 
                 # if the spec is abstract, descend into dependencies.
                 # if it's concrete, then the hashes above take care of dependency
@@ -2273,9 +2358,7 @@ class SpackSolverSetup:
             # All the versions from the corresponding package.py file. Since concepts
             # like being a "develop" version or being preferred exist only at a
             # package.py level, sort them in this partial list here
-            package_py_versions = sorted(
-                pkg_cls.versions.items(), key=concretization_version_order, reverse=True
-            )
+            package_py_versions = _sorted_package_py_versions(pkg_cls)
 
             if require_checksum and pkg_cls.has_code:
                 package_py_versions = [
@@ -2296,35 +2379,48 @@ class SpackSolverSetup:
             if pkg_name not in packages_yaml or "version" not in packages_yaml[pkg_name]:
                 continue
 
-            version_defs: List[GitOrStandardVersion] = []
+            # dict to dedupe declared versions while preserving insertion order
+            version_defs: Dict[GitOrStandardVersion, None] = {}
+
+            # sort the known versions once, so every preference below yields its
+            # matches already in descending order
+            sorted_possible_versions = sorted(self.possible_versions[pkg_name], reverse=True)
 
             for vstr in packages_yaml[pkg_name]["version"]:
                 v = vn.ver(vstr)
 
                 if isinstance(v, vn.GitVersion):
                     if not require_checksum or v.is_commit:
-                        version_defs.append(v)
+                        version_defs[v] = None
                 else:
-                    matches = [x for x in self.possible_versions[pkg_name] if x.satisfies(v)]
-                    matches.sort(reverse=True)
+                    matches = [x for x in sorted_possible_versions if x.satisfies(v)]
                     if not matches:
                         raise spack.error.ConfigError(
                             f"Preference for version {v} does not match any known "
                             f"version of {pkg_name} (in its package.py or any external)"
                         )
-                    version_defs.extend(matches)
+                    version_defs.update(dict.fromkeys(matches))
 
-            for weight, vdef in enumerate(llnl.util.lang.dedupe(version_defs)):
+            for weight, vdef in enumerate(version_defs):
                 self.declared_versions[pkg_name].append(
                     DeclaredVersion(version=vdef, idx=weight, origin=Provenance.PACKAGES_YAML)
                 )
                 self.possible_versions[pkg_name].add(vdef)
 
     def define_ad_hoc_versions_from_specs(
-        self, specs, origin, *, allow_deprecated: bool, require_checksum: bool
+        self, specs, origin, *, allow_deprecated: bool, require_checksum: bool, visited: Set[str]
     ):
-        """Add concrete versions to possible versions from lists of CLI/dev specs."""
+        """Add concrete versions to possible versions from lists of CLI/dev specs.
+
+        Concrete nodes whose DAG hash is in ``visited`` are skipped, and newly seen
+        ones are added, so sub-DAGs shared between input lists are processed once.
+        """
         for s in traverse.traverse_nodes(specs):
+            if s.concrete:
+                if s.dag_hash() in visited:
+                    continue
+                visited.add(s.dag_hash())
+
             # If there is a concrete version on the CLI *that we know nothing
             # about*, add it to the known versions. Use idx=0, which is the
             # best possible, so they're guaranteed to be used preferentially.
@@ -2352,16 +2448,16 @@ class SpackSolverSetup:
         """
         supported = []
 
-        for target in targets:
-            try:
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore")
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for target in targets:
+                try:
                     target.optimization_flags(compiler_name, str(compiler_version))
-                supported.append(target)
-            except archspec.cpu.UnsupportedMicroarchitecture:
-                continue
-            except ValueError:
-                continue
+                    supported.append(target)
+                except archspec.cpu.UnsupportedMicroarchitecture:
+                    continue
+                except ValueError:
+                    continue
 
         return sorted(supported, reverse=True)
 
@@ -2386,8 +2482,7 @@ class SpackSolverSetup:
                 buildable.add(spec.architecture.os)
 
         # make directives for buildable OS's
-        for build_os in sorted(buildable):
-            self.gen.fact(fn.buildable_os(build_os))
+        self.gen.bulk_facts("buildable_os", sorted(buildable))
 
         def keyfun(os):
             return (
@@ -2419,6 +2514,11 @@ class SpackSolverSetup:
         granularity = spack.config.get("concretizer:targets:granularity")
         host_compatible = spack.config.get("concretizer:targets:host_compatible")
 
+        # In a reduced solve consider only targets compatible with the host, and
+        # rely on the caller to retry with the full universe if that is UNSAT
+        if self.reduced:
+            host_compatible = True
+
         # Add targets which are not compatible with the current host
         if not host_compatible:
             additional_targets_in_family = sorted(
@@ -2453,6 +2553,19 @@ class SpackSolverSetup:
                         candidate_targets.append(ancestor)
 
         best_targets = {uarch.family.name}
+
+        # Compiler versions are often clustered (e.g. many gcc@11.x entries), so
+        # cache the supported targets per (name, version) across compilers
+        supported_targets_cache: Dict[Tuple[str, str], List] = {}
+
+        def supported_targets(compiler_name, compiler_version):
+            key = (compiler_name, str(compiler_version))
+            if key not in supported_targets_cache:
+                supported_targets_cache[key] = self._supported_targets(
+                    compiler_name, compiler_version, candidate_targets
+                )
+            return supported_targets_cache[key]
+
         for compiler_id, known_compiler in enumerate(self.possible_compilers):
             if not known_compiler.available:
                 continue
@@ -2467,16 +2580,14 @@ class SpackSolverSetup:
                 self.gen.newline()
                 continue
 
-            supported = self._supported_targets(compiler.name, compiler.version, candidate_targets)
+            supported = supported_targets(compiler.name, compiler.version)
 
             # If we can't find supported targets it may be due to custom
             # versions in the spec, e.g. gcc@foo. Try to match the
             # real_version from the compiler object to get more accurate
             # results.
             if not supported:
-                supported = self._supported_targets(
-                    compiler.name, compiler.real_version, candidate_targets
-                )
+                supported = supported_targets(compiler.name, compiler.real_version)
 
             if not supported:
                 continue
@@ -2514,8 +2625,7 @@ class SpackSolverSetup:
 
     def virtual_providers(self):
         self.gen.h2("Virtual providers")
-        for vspec in sorted(self.possible_virtuals):
-            self.gen.fact(fn.virtual(vspec))
+        self.gen.bulk_facts("virtual", sorted(self.possible_virtuals))
         self.gen.newline()
 
     def define_version_constraints(self):
@@ -2534,28 +2644,34 @@ class SpackSolverSetup:
         Must be called before define_version_constraints().
         """
         # aggregate constraints into per-virtual sets
-        constraint_map = collections.defaultdict(lambda: set())
+        constraint_map = collections.defaultdict(set)
         for pkg_name, versions in self.version_constraints:
-            if not spack.repo.PATH.is_virtual(pkg_name):
+            if not self._is_virtual(pkg_name):
                 continue
             constraint_map[pkg_name].add(versions)
 
-        # extract all the real versions mentioned in version ranges
+        # extract all the real versions mentioned in version ranges, walking
+        # version lists iteratively to avoid quadratic list concatenation
         def versions_for(v):
-            if isinstance(v, vn.StandardVersion):
-                return [v]
-            elif isinstance(v, vn.ClosedOpenRange):
-                return [v.lo, vn._prev_version(v.hi)]
-            elif isinstance(v, vn.VersionList):
-                return sum((versions_for(e) for e in v), [])
-            else:
-                raise TypeError("expected version type, found: %s" % type(v))
+            out, stack = [], [v]
+            while stack:
+                x = stack.pop()
+                if isinstance(x, vn.StandardVersion):
+                    out.append(x)
+                elif isinstance(x, vn.ClosedOpenRange):
+                    out.append(x.lo)
+                    out.append(vn._prev_version(x.hi))
+                elif isinstance(x, vn.VersionList):
+                    stack.extend(x)
+                else:
+                    raise TypeError("expected version type, found: %s" % type(x))
+            return out
 
         # define a set of synthetic possible versions for virtuals, so
         # that `version_satisfies(Package, Constraint, Version)` has the
         # same semantics for virtuals as for regular packages.
         for pkg_name, versions in sorted(constraint_map.items()):
-            possible_versions = set(sum([versions_for(v) for v in versions], []))
+            possible_versions = {x for v in versions for x in versions_for(v)}
             for version in sorted(possible_versions):
                 self.possible_versions[pkg_name].add(version)
 
@@ -2571,30 +2687,34 @@ class SpackSolverSetup:
         self.gen.newline()
 
     def define_target_constraints(self):
-        def _all_targets_satisfiying(single_constraint):
-            allowed_targets = []
+        all_targets, at_least, at_most = _target_range_bitsets()
+        all_ones = (1 << len(all_targets)) - 1
 
+        def _all_targets_satisfiying(single_constraint):
             if ":" not in single_constraint:
                 return [single_constraint]
 
             t_min, _, t_max = single_constraint.partition(":")
-            for test_target in archspec.cpu.TARGETS.values():
-                # Check lower bound
-                if t_min and not t_min <= test_target:
-                    continue
-
-                # Check upper bound
-                if t_max and not t_max >= test_target:
-                    continue
-
-                allowed_targets.append(test_target)
-            return allowed_targets
+            if (t_min and t_min not in at_least) or (t_max and t_max not in at_most):
+                # same error raised when comparing against an unknown target name
+                unknown = t_min if t_min and t_min not in at_least else t_max
+                raise ValueError(f'"{unknown}" is not a valid target name')
+
+            # intersect the precomputed bitsets for the two bounds: bit i is set
+            # iff the i-th target falls within the range
+            mask = (at_least[t_min] if t_min else all_ones) & (
+                at_most[t_max] if t_max else all_ones
+            )
+            return [t for idx, t in enumerate(all_targets) if mask & (1 << idx)]
 
         cache = {}
         for target_constraint in sorted(self.target_constraints, key=lambda x: x.name):
-            # Construct the list of allowed targets for this constraint
+            # Construct the list of allowed targets for this constraint. The range
+            # components are encoded in the constraint's name (e.g.
+            # "x86_64:haswell,skylake"), so iterate that directly instead of going
+            # through a __str__ round-trip.
             allowed_targets = []
-            for single_constraint in str(target_constraint).split(","):
+            for single_constraint in target_constraint.name.split(","):
                 if single_constraint not in cache:
                     cache[single_constraint] = _all_targets_satisfiying(single_constraint)
                 allowed_targets.extend(cache[single_constraint])
@@ -2622,11 +2742,18 @@ class SpackSolverSetup:
         if spec.name not in possible:
             return
 
+        # Skip the package lookup for specs that were already registered explicitly, e.g.
+        # because the same reusable spec was selected from multiple sources
+        if spec.dag_hash() in self.reusable_and_possible.explicit:
+            return
+
         try:
             # Only consider installed packages for repo we know
             spack.repo.PATH.get(spec)
         except (spack.repo.UnknownNamespaceError, spack.repo.UnknownPackageError) as e:
-            tty.debug(f"[REUSE] Issues when trying to reuse {spec.short_spec}: {str(e)}")
+            # guard the call, so that spec.short_spec is not computed when debug is off
+            if tty.is_debug():
+                tty.debug(f"[REUSE] Issues when trying to reuse {spec.short_spec}: {str(e)}")
             return
 
         self.reusable_and_possible.add(spec)
@@ -2634,34 +2761,48 @@ class SpackSolverSetup:
     def concrete_specs(self):
         """Emit facts for reusable specs"""
         for h, spec in self.reusable_and_possible.explicit_items():
-            # this indicates that there is a spec like this installed
-            self.gen.fact(fn.installed_hash(spec.name, h))
-            # indirection layer between hash constraints and imposition to allow for splicing
-            for pred in self.spec_clauses(spec, body=True, required_from=None):
-                self.gen.fact(fn.hash_attr(h, *pred.args))
+            # Format all the facts for a spec as one chunk, emitted with a single
+            # append instead of one fact call per predicate
+            chunk = self._concrete_facts_cache.get(h)
+            if chunk is None:
+                # this indicates that there is a spec like this installed
+                parts = [f"{fn.installed_hash(spec.name, h).symbol()}.\n"]
+                # indirection layer between hash constraints and imposition to allow
+                # for splicing
+                parts.extend(
+                    f"{fn.hash_attr(h, *pred.args).symbol()}.\n"
+                    for pred in self.spec_clauses(spec, body=True, required_from=None)
+                )
+                chunk = "".join(parts)
+                self._concrete_facts_cache[h] = chunk
+            self.gen.append(chunk)
             self.gen.newline()
-            # Declare as possible parts of specs that are not in package.py
-            # - Add versions to possible versions
-            # - Add OS to possible OS's
-            for dep in spec.traverse():
-                self.possible_versions[dep.name].add(dep.version)
-                if isinstance(dep.version, vn.GitVersion):
-                    self.declared_versions[dep.name].append(
-                        DeclaredVersion(
-                            version=dep.version, idx=0, origin=Provenance.INSTALLED_GIT_VERSION
-                        )
-                    )
-                else:
-                    self.declared_versions[dep.name].append(
-                        DeclaredVersion(version=dep.version, idx=0, origin=Provenance.INSTALLED)
+
+        # Declare as possible parts of specs that are not in package.py
+        # - Add versions to possible versions
+        # - Add OS to possible OS's
+        # The mapping already contains every node of every reusable spec keyed by hash,
+        # so a single flat pass covers them all without re-walking shared sub-DAGs.
+        for dep in self.reusable_and_possible.values():
+            self.possible_versions[dep.name].add(dep.version)
+            if isinstance(dep.version, vn.GitVersion):
+                self.declared_versions[dep.name].append(
+                    DeclaredVersion(
+                        version=dep.version, idx=0, origin=Provenance.INSTALLED_GIT_VERSION
                     )
-                self.possible_oses.add(dep.os)
+                )
+            else:
+                self.declared_versions[dep.name].append(
+                    DeclaredVersion(version=dep.version, idx=0, origin=Provenance.INSTALLED)
+                )
+            self.possible_oses.add(dep.os)
 
-    def define_concrete_input_specs(self, specs, possible):
+    def define_concrete_input_specs(self, specs, possible, visited: Set[str]):
         # any concrete specs in the input spec list
         for input_spec in specs:
             for spec in input_spec.traverse():
-                if spec.concrete:
+                if spec.concrete and spec.dag_hash() not in visited:
+                    visited.add(spec.dag_hash())
                     self.register_concrete_spec(spec, possible)
 
     def setup(
@@ -2687,7 +2828,10 @@ class SpackSolverSetup:
         node_counter = _create_counter(specs, tests=self.tests)
         self.possible_virtuals = node_counter.possible_virtuals()
         self.pkgs = node_counter.possible_dependencies()
+        # sorted once here, since the set is not mutated after this point
+        self.sorted_pkgs = sorted(self.pkgs)
         self.libcs = sorted(all_libcs())  # type: ignore[type-var]
+        self.libc_attrs = [(libc.name, libc.version) for libc in self.libcs]
 
         # Fail if we already know an unreachable node is requested
         for spec in specs:
@@ -2728,7 +2872,10 @@ class SpackSolverSetup:
         specs = tuple(specs)  # ensure compatible types to add
 
         self.gen.h1("Reusable concrete specs")
-        self.define_concrete_input_specs(specs, self.pkgs)
+        # DAG hashes of concrete nodes already processed, shared across the defines below
+        # so that sub-DAGs appearing in several input lists are walked only once
+        visited_concrete: Set[str] = set()
+        self.define_concrete_input_specs(specs, self.pkgs, visited_concrete)
         if reuse:
             self.gen.fact(fn.optimize_for_reuse())
             for reusable_spec in reuse:
@@ -2742,8 +2889,7 @@ class SpackSolverSetup:
         node_counter.possible_packages_facts(self.gen, fn)
 
         self.gen.h1("Possible flags on nodes")
-        for flag in spack.spec.FlagMap.valid_compiler_flags():
-            self.gen.fact(fn.flag_type(flag))
+        self.gen.bulk_facts("flag_type", spack.spec.FlagMap.valid_compiler_flags())
         self.gen.newline()
 
         self.gen.h1("General Constraints")
@@ -2766,20 +2912,25 @@ class SpackSolverSetup:
             self.pkgs, allow_deprecated=allow_deprecated, require_checksum=checksummed
         )
         self.define_ad_hoc_versions_from_specs(
-            specs, Provenance.SPEC, allow_deprecated=allow_deprecated, require_checksum=checksummed
+            specs,
+            Provenance.SPEC,
+            allow_deprecated=allow_deprecated,
+            require_checksum=checksummed,
+            visited=visited_concrete,
         )
         self.define_ad_hoc_versions_from_specs(
             dev_specs,
             Provenance.DEV_SPEC,
             allow_deprecated=allow_deprecated,
             require_checksum=checksummed,
+            visited=visited_concrete,
         )
         self.validate_and_define_versions_from_requirements(
             allow_deprecated=allow_deprecated, require_checksum=checksummed
         )
 
         self.gen.h1("Package Constraints")
-        for pkg in sorted(self.pkgs):
+        for pkg in self.sorted_pkgs:
             self.gen.h2("Package rules: %s" % pkg)
             self.pkg_rules(pkg, tests=self.tests)
             self.gen.h2("Package preferences: %s" % pkg)
@@ -2833,8 +2984,10 @@ class SpackSolverSetup:
                             if name == "internal_error":
                                 arg = ast_sym(ast_sym(term.atom).arguments[0])
                                 symbol = AspFunction(name)(arg.string)
-                                self.assumptions.append((parse_term(str(symbol)), True))
-                                self.gen.asp_problem.append(f"{{ {symbol} }}.\n")
+                                # construct the clingo symbol directly, instead of
+                                # round-tripping through the clingo parser
+                                self.assumptions.append((symbol.symbol(), True))
+                                self.gen.append(f"{{ {symbol} }}.\n")
 
         path = os.path.join(parent_dir, "concretize.lp")
         parse_files([path], visit)
@@ -2843,11 +2996,13 @@ class SpackSolverSetup:
         """Define the constraints to be imposed on the runtimes"""
         recorder = RuntimePropertyRecorder(self)
 
+        compiler_with_different_cls_names = {"oneapi": "intel-oneapi-compilers", "clang": "llvm"}
+
         for compiler in self.possible_compilers:
-            compiler_with_different_cls_names = {
-                "oneapi": "intel-oneapi-compilers",
-                "clang": "llvm",
-            }
+            # The package class lookup imports the package module on first use, and
+            # both the repo finder and the directive machinery behind that import
+            # rely on unsynchronized global state, so the classes are resolved
+            # serially; repeat lookups hit the module cache anyway.
             compiler_cls_name = compiler_with_different_cls_names.get(
                 compiler.spec.name, compiler.spec.name
             )
@@ -2878,6 +3033,12 @@ class SpackSolverSetup:
         recorder.consume_facts()
 
     def literal_specs(self, specs):
+        # hoist the attr functions out of the loops below, to skip the dynamic
+        # dispatch through the fn builder on every clause
+        variant_from_cli = fn.attr("variant_default_value_from_cli")
+        root = fn.attr("root")
+        virtual_root = fn.attr("virtual_root")
+
         for spec in specs:
             self.gen.h2("Spec: %s" % str(spec))
             condition_id = next(self._id_counter)
@@ -2901,15 +3062,13 @@ class SpackSolverSetup:
             for clause in requirements:
                 clause_name = clause.args[0]
                 if clause_name == "variant_set":
-                    requirements.append(
-                        fn.attr("variant_default_value_from_cli", *clause.args[1:])
-                    )
+                    requirements.append(variant_from_cli(*clause.args[1:]))
                 elif clause_name in ("node", "virtual_node", "hash"):
                     # These facts are needed to compute the "condition_set" of the root
                     pkg_name = clause.args[1]
                     self.gen.fact(fn.mentioned_in_literal(trigger_id, root_name, pkg_name))
 
-            requirements.append(fn.attr("virtual_root" if spec.virtual else "root", spec.name))
+            requirements.append((virtual_root if spec.virtual else root)(spec.name))
             cache[imposed_spec_key] = (effect_id, requirements)
             self.gen.fact(fn.pkg_fact(spec.name, fn.condition_effect(condition_id, effect_id)))
 
@@ -2997,6 +3156,8 @@ class SpackSolverSetup:
 class _Head:
     """ASP functions used to express spec clauses in the HEAD of a rule"""
 
+    __slots__ = ()
+
     node = fn.attr("node")
     namespace = fn.attr("namespace_set")
     virtual_node = fn.attr("virtual_node")
@@ -3013,6 +3174,8 @@ class _Head:
 class _Body:
     """ASP functions used to express spec clauses in the BODY of a rule"""
 
+    __slots__ = ()
+
     node = fn.attr("node")
     namespace = fn.attr("namespace")
     virtual_node = fn.attr("virtual_node")
@@ -3038,23 +3201,52 @@ class ProblemInstanceBuilder:
     The problem instance can be added directly to the "control" structure of clingo.
     """
 
+    __slots__ = ("_buffer", "_fact_cache")
+
     def __init__(self):
-        self.asp_problem = []
+        # A single growing buffer generates much less garbage than a list of
+        # millions of small string fragments joined at the end
+        self._buffer = io.StringIO()
+
+        # Formatting a fact goes through the clingo symbol constructor, and the
+        # same atoms are emitted many times per problem: cache their textual form
+        self._fact_cache: Dict[Tuple, str] = {}
 
     def fact(self, atom: AspFunction) -> None:
+        # Cache the text only for atoms with plain arguments: richer arguments
+        # (specs, versions, platforms) are not reliably hashable. Booleans are
+        # excluded since True would collide with 1 as a key while formatting
+        # differently.
+        key = None
+        args = getattr(atom, "args", None)
+        if args is not None and all(type(a) in (str, int) for a in args):
+            key = (atom.name, args)
+            text = self._fact_cache.get(key)
+            if text is not None:
+                self._buffer.write(text)
+                return
+
         symbol = atom.symbol() if hasattr(atom, "symbol") else atom
-        self.asp_problem.append(f"{str(symbol)}.\n")
+        text = f"{symbol}.\n"
+        if key is not None:
+            self._fact_cache[key] = text
+        self._buffer.write(text)
 
     def append(self, rule: str) -> None:
-        self.asp_problem.append(rule)
+        self._buffer.write(rule)
+
+    def bulk_facts(self, name: str, args: Iterable[str]) -> None:
+        """Emit one fact per argument, for facts of a single plain string argument.
+
+        This writes the facts in a single pass, without going through a per-atom
+        AspFunction and clingo symbol construction. The arguments must not need
+        escaping (e.g. package, virtual or flag names).
+        """
+        self._buffer.write("".join(f'{name}("{arg}").\n' for arg in args))
 
     def title(self, header: str, char: str) -> None:
-        self.asp_problem.append("\n")
-        self.asp_problem.append("%" + (char * 76))
-        self.asp_problem.append("\n")
-        self.asp_problem.append(f"% {header}\n")
-        self.asp_problem.append("%" + (char * 76))
-        self.asp_problem.append("\n")
+        banner = "%" + (char * 76)
+        self._buffer.write(f"\n{banner}\n% {header}\n{banner}\n")
 
     def h1(self, header: str) -> None:
         self.title(header, "=")
@@ -3063,13 +3255,13 @@ class ProblemInstanceBuilder:
         self.title(header, "-")
 
     def h3(self, header: str):
-        self.asp_problem.append(f"% {header}\n")
+        self._buffer.write(f"% {header}\n")
 
     def newline(self):
-        self.asp_problem.append("\n")
+        self._buffer.write("\n")
 
     def value(self) -> str:
-        return "".join(self.asp_problem)
+        return self._buffer.getvalue()
 
 
 def parse_spec_from_yaml_string(string: str) -> "spack.spec.Spec":
@@ -3259,11 +3451,12 @@ class RequirementParser:
                 s.constrain(constraint)
                 s.validate_or_raise()
             except spack.error.SpackError as e:
-                tty.debug(
-                    f"[SETUP] Rejecting the default '{constraint}' requirement "
-                    f"on '{pkg_name}': {str(e)}",
-                    level=2,
-                )
+                if tty.is_debug(level=2):
+                    tty.debug(
+                        f"[SETUP] Rejecting the default '{constraint}' requirement "
+                        f"on '{pkg_name}': {str(e)}",
+                        level=2,
+                    )
                 return True
         return False
 
@@ -3629,14 +3822,27 @@ class SpecBuilder:
         self._splices: Dict[NodeArgument, List[Splice]] = {}
         self._result = None
         self._command_line_specs = specs
-        self._flag_sources: Dict[Tuple[NodeArgument, str], Set[str]] = collections.defaultdict(
-            lambda: set()
-        )
+        self._flag_sources: Dict[Tuple[NodeArgument, str], Set[str]] = collections.defaultdict(set)
 
         # Pass in as arguments reusable specs and plug them in
         # from this dictionary during reconstruction
         self._hash_lookup = hash_lookup or ConcreteSpecsByHash()
 
+        # Package classes looked up while rebuilding specs, keyed by full name. The
+        # cache dies with the builder, so classes are never retained across solves.
+        self._pkg_class_cache: Dict[str, Type["spack.package_base.PackageBase"]] = {}
+
+        # Edges created by depends_on, indexed by the identity of their endpoints, so
+        # that virtual_on_edge does not need to scan the parent's edges
+        self._edge_index: Dict[Tuple[int, int], spack.spec.DependencySpec] = {}
+
+    def _pkg_class(self, fullname: str) -> Type["spack.package_base.PackageBase"]:
+        cls = self._pkg_class_cache.get(fullname)
+        if cls is None:
+            cls = spack.repo.PATH.get_pkg_class(fullname)
+            self._pkg_class_cache[fullname] = cls
+        return cls
+
     def hash(self, node, h):
         if node not in self._specs:
             self._specs[node] = self._hash_lookup[h]
@@ -3701,7 +3907,7 @@ class SpecBuilder:
         self._specs[node].extra_attributes = spec_info.get("extra_attributes", {})
 
         # If this is an extension, update the dependencies to include the extendee
-        package = self._specs[node].package_class(self._specs[node])
+        package = self._pkg_class(self._specs[node].fullname)(self._specs[node])
         extendee_spec = package.extendee_spec
 
         if extendee_spec:
@@ -3711,14 +3917,24 @@ class SpecBuilder:
     def depends_on(self, parent_node, dependency_node, type):
         dependency_spec = self._specs[dependency_node]
         depflag = dt.flag_from_string(type)
-        self._specs[parent_node].add_dependency_edge(dependency_spec, depflag=depflag, virtuals=())
+        parent_spec = self._specs[parent_node]
+        parent_spec.add_dependency_edge(dependency_spec, depflag=depflag, virtuals=())
+        for edge in parent_spec.edges_to_dependencies(name=dependency_spec.name):
+            if edge.spec is dependency_spec:
+                self._edge_index[(id(parent_spec), id(dependency_spec))] = edge
+                break
 
     def virtual_on_edge(self, parent_node, provider_node, virtual):
-        dependencies = self._specs[parent_node].edges_to_dependencies(name=(provider_node.pkg))
+        parent_spec = self._specs[parent_node]
         provider_spec = self._specs[provider_node]
-        dependencies = [x for x in dependencies if id(x.spec) == id(provider_spec)]
-        assert len(dependencies) == 1, f"{virtual}: {provider_node.pkg}"
-        dependencies[0].update_virtuals((virtual,))
+        edge = self._edge_index.get((id(parent_spec), id(provider_spec)))
+        if edge is None:
+            # edges not created by depends_on, e.g. added for external extensions
+            dependencies = parent_spec.edges_to_dependencies(name=(provider_node.pkg))
+            dependencies = [x for x in dependencies if id(x.spec) == id(provider_spec)]
+            assert len(dependencies) == 1, f"{virtual}: {provider_node.pkg}"
+            edge = dependencies[0]
+        edge.update_virtuals((virtual,))
 
     def reorder_flags(self):
         """For each spec, determine the order of compiler flags applied to it.
@@ -3751,19 +3967,43 @@ class SpecBuilder:
             if spec.compiler in compilers:
                 flagmap_from_compiler = compilers[spec.compiler].flags
 
+            node = SpecBuilder.make_node(pkg=spec.name)
+
+            # For flags that are applied by dependents, put flags from parents
+            # before children; we depend on the stability of traverse() to
+            # achieve a stable flag order for flags introduced in this manner.
+            # The ancestor walk only depends on the node, so do it once here
+            # rather than once per flag type.
+            topo_order = [s.name for s in spec.traverse(order="post", direction="parents")]
+            topo_pos: Dict[str, int] = {}
+            for index, pkg_name in enumerate(topo_order):
+                topo_pos.setdefault(pkg_name, index)
+
             for flag_type in spec.compiler_flags.valid_compiler_flags():
-                node = SpecBuilder.make_node(pkg=spec.name)
+                from_compiler = tuple(flagmap_from_compiler.get(flag_type, []))
+                node_flags = self._specs[node].compiler_flags.get(flag_type, [])
+                cmd_flags = (
+                    cmd_specs[node.pkg].compiler_flags.get(flag_type, [])
+                    if node.pkg in cmd_specs
+                    else []
+                )
+
+                # Most nodes have no flags of a given type from any source, in
+                # which case there is nothing to order
+                if not from_compiler and not node_flags and not cmd_flags:
+                    if not spec.compiler_flags.get(flag_type):
+                        spec.compiler_flags.update({flag_type: []})
+                        continue
 
                 ordered_flags = []
 
                 # 1. Put compiler flags first
-                from_compiler = tuple(flagmap_from_compiler.get(flag_type, []))
                 extend_flag_list(ordered_flags, from_compiler)
 
                 # 2. Add all sources (the compiler is one of them, so skip any
                 # flag group that matches it exactly)
                 flag_groups = set()
-                for flag in self._specs[node].compiler_flags.get(flag_type, []):
+                for flag in node_flags:
                     flag_groups.add(
                         spack.spec.CompilerFlag(
                             flag.flag_group,
@@ -3773,29 +4013,27 @@ class SpecBuilder:
                         )
                     )
 
-                # For flags that are applied by dependents, put flags from parents
-                # before children; we depend on the stability of traverse() to
-                # achieve a stable flag order for flags introduced in this manner.
-                topo_order = list(s.name for s in spec.traverse(order="post", direction="parents"))
-                lex_order = list(sorted(flag_groups))
+                # Record the first position of each flag group, so lookups in the
+                # sort key below are O(1) instead of scanning a list.
+                lex_pos = {group: index for index, group in enumerate(sorted(flag_groups))}
 
                 def _order_index(flag_group):
                     source = flag_group.source
                     # Note: if 'require: ^dependency cflags=...' is ever possible,
                     # this will topologically sort for require as well
                     type_index, pkg_source = ConstraintOrigin.strip_type_suffix(source)
-                    if pkg_source in topo_order:
-                        major_index = topo_order.index(pkg_source)
+                    if pkg_source in topo_pos:
+                        major_index = topo_pos[pkg_source]
                         # If for x->y, x has multiple depends_on declarations that
                         # are activated, and each adds cflags to y, we fall back on
                         # alphabetical ordering to maintain a total order
-                        minor_index = lex_order.index(flag_group)
+                        minor_index = lex_pos[flag_group]
                     else:
-                        major_index = len(topo_order) + lex_order.index(flag_group)
+                        major_index = len(topo_order) + lex_pos[flag_group]
                         minor_index = 0
                     return (type_index, major_index, minor_index)
 
-                prioritized_groups = sorted(flag_groups, key=lambda x: _order_index(x))
+                prioritized_groups = sorted(flag_groups, key=_order_index)
 
                 for grp in prioritized_groups:
                     grp_flags = tuple(
@@ -3815,13 +4053,14 @@ class SpecBuilder:
                     extend_flag_list(ordered_flags, as_compiler_flags)
 
                 # 3. Now put cmd-line flags last
-                if node.pkg in cmd_specs:
-                    cmd_flags = cmd_specs[node.pkg].compiler_flags.get(flag_type, [])
-                    extend_flag_list(ordered_flags, cmd_flags)
+                extend_flag_list(ordered_flags, cmd_flags)
 
                 compiler_flags = spec.compiler_flags.get(flag_type, [])
-                msg = "%s does not equal %s" % (set(compiler_flags), set(ordered_flags))
-                assert set(compiler_flags) == set(ordered_flags), msg
+                # The message is only evaluated on failure, and the whole check is
+                # elided when running under python -O
+                assert set(compiler_flags) == set(
+                    ordered_flags
+                ), f"{set(compiler_flags)} does not equal {set(ordered_flags)}"
 
                 spec.compiler_flags.update({flag_type: ordered_flags})
 
@@ -3879,41 +4118,65 @@ class SpecBuilder:
             self._specs[node] = new_spec
             fixed_specs[spec] = new_spec
 
+    #: Ranks used to ensure attributes are evaluated in the correct order:
+    #:
+    #: hash attributes are handled first, since they imply entire concrete specs
+    #: node attributes are handled next, since they instantiate nodes
+    #: external_spec_selected attributes are handled last, so that external extensions can find
+    #: the concrete specs on which they depend because all nodes are fully constructed before we
+    #: consider which ones are external. Attributes not listed rank as -1.
+    attribute_ranks = {
+        "hash": -5,
+        "node": -4,
+        "node_flag": -2,
+        "external_spec_selected": 0,  # note out of order so this goes last
+        "virtual_on_edge": 1,
+    }
+
     @staticmethod
-    def sort_fn(function_tuple) -> Tuple[int, int]:
-        """Ensure attributes are evaluated in the correct order.
-
-        hash attributes are handled first, since they imply entire concrete specs
-        node attributes are handled next, since they instantiate nodes
-        external_spec_selected attributes are handled last, so that external extensions can find
-        the concrete specs on which they depend because all nodes are fully constructed before we
-        consider which ones are external.
-        """
-        name = function_tuple[0]
-        if name == "hash":
-            return (-5, 0)
-        elif name == "node":
-            return (-4, 0)
-        elif name == "node_flag":
-            return (-2, 0)
-        elif name == "external_spec_selected":
-            return (0, 0)  # note out of order so this goes last
-        elif name == "virtual_on_edge":
-            return (1, 0)
-        else:
-            return (-1, 0)
+    def sort_fn(function_tuple) -> int:
+        """Rank a function tuple by its attribute name, see ``attribute_ranks``."""
+        return SpecBuilder.attribute_ranks.get(function_tuple[0], -1)
 
-    def build_specs(self, function_tuples):
+    def build_specs(
+        self, function_tuples: List[Tuple[str, Tuple]]
+    ) -> Dict[NodeArgument, "spack.spec.Spec"]:
         # Functions don't seem to be in particular order in output.  Sort
         # them here so that directives that build objects (like node and
-        # node_compiler) are called in the right order.
-        self.function_tuples = sorted(set(function_tuples), key=self.sort_fn)
+        # node_compiler) are called in the right order. Ranks are computed in
+        # one pass, so the sort itself only compares and fetches integers.
+        ranks = SpecBuilder.attribute_ranks
+        unordered = list(set(function_tuples))
+        rank_of = [ranks.get(name, -1) for name, _ in unordered]
+        order = sorted(range(len(unordered)), key=rank_of.__getitem__)
+        self.function_tuples = [unordered[index] for index in order]
         self._specs = {}
+
+        # The loop below sees the same few attribute names and package names over and
+        # over: resolve the regex match and the virtual check once per distinct name
+        ignored_match = SpecBuilder.ignored_attributes.match
+        ignored_cache: Dict[str, bool] = {}
+        is_virtual = functools.lru_cache(maxsize=None)(spack.repo.PATH.is_virtual)
+        action_cache: Dict[str, Optional[Callable]] = {}
+
         for name, args in self.function_tuples:
-            if SpecBuilder.ignored_attributes.match(name):
+            ignored = ignored_cache.get(name)
+            if ignored is None:
+                ignored = ignored_match(name) is not None
+                ignored_cache[name] = ignored
+            if ignored:
                 continue
 
-            action = getattr(self, name, None)
+            if name in action_cache:
+                action = action_cache[name]
+            else:
+                action = getattr(self, name, None)
+                msg = (
+                    "Internal Error: Uncallable action found in asp.py.  Please report to the"
+                    " spack maintainers."
+                )
+                assert action is None or callable(action), msg
+                action_cache[name] = action
 
             # print out unknown actions so we can display them for debugging
             if not action:
@@ -3921,19 +4184,13 @@ class SpecBuilder:
                 tty.debug(msg)
                 continue
 
-            msg = (
-                "Internal Error: Uncallable action found in asp.py.  Please report to the spack"
-                " maintainers."
-            )
-            assert action and callable(action), msg
-
             # ignore predicates on virtual packages, as they're used for
             # solving but don't construct anything. Do not ignore error
             # predicates on virtual packages.
             if name != "error":
                 node = args[0]
                 pkg = node.pkg
-                if spack.repo.PATH.is_virtual(pkg):
+                if is_virtual(pkg):
                     continue
 
                 # if we've already gotten a concrete spec for this pkg,
@@ -3953,22 +4210,34 @@ class SpecBuilder:
 
         # inject patches -- note that we' can't use set() to unique the
         # roots here, because the specs aren't complete, and the hash
-        # function will loop forever.
-        roots = [spec.root for spec in self._specs.values()]
-        roots = dict((id(r), r) for r in roots)
-        for root in roots.values():
+        # function will loop forever. Dedupe on object identity instead.
+        seen_roots: Set[int] = set()
+        roots: List[spack.spec.Spec] = []
+        for spec in self._specs.values():
+            root = spec.root
+            if id(root) not in seen_roots:
+                seen_roots.add(id(root))
+                roots.append(root)
+        for root in roots:
             spack.spec.Spec.inject_patches_variant(root)
 
-        # Add external paths to specs with just external modules
+        # Add external paths to specs with just external modules, and apply dev_path
+        # settings from the environment, touching each spec once
+        env = ev.active_environment()
         for s in self._specs.values():
             spack.spec.Spec.ensure_external_path_if_external(s)
+            _develop_specs_from_env(s, env)
 
-        for s in self._specs.values():
-            _develop_specs_from_env(s, ev.active_environment())
-
-        # mark concrete and assign hashes to all specs in the solve
-        for root in roots.values():
-            root._finalize_concretization()
+        # mark concrete and assign hashes to all specs in the solve, finalizing
+        # nodes shared among several roots a single time
+        seen_nodes: Set[int] = set()
+        nodes: List[spack.spec.Spec] = []
+        for root in roots:
+            for s in root.traverse():
+                if id(s) not in seen_nodes:
+                    seen_nodes.add(id(s))
+                    nodes.append(s)
+        spack.spec.Spec._finalize_concretization_of_nodes(nodes)
 
         self._resolve_automatic_splices()
 
@@ -3977,13 +4246,13 @@ class SpecBuilder:
 
         # Add git version lookup info to concrete Specs (this is generated for
         # abstract specs as well but the Versions may be replaced during the
-        # concretization process)
-        for root in self._specs.values():
-            for spec in root.traverse():
-                if isinstance(spec.version, vn.GitVersion):
-                    spec.version.attach_lookup(
-                        spack.version.git_ref_lookup.GitRefLookup(spec.fullname)
-                    )
+        # concretization process). Every node of the solve has its own entry in
+        # self._specs, so there is no need to traverse each root.
+        for spec in self._specs.values():
+            if isinstance(spec.version, vn.GitVersion):
+                spec.version.attach_lookup(
+                    spack.version.git_ref_lookup.GitRefLookup(spec.fullname)
+                )
 
         specs = self.execute_explicit_splices()
         return specs
@@ -3992,7 +4261,9 @@ class SpecBuilder:
         splice_config = spack.config.CONFIG.get("concretizer:splice:explicit", [])
         splice_triples = []
         for splice_set in splice_config:
-            target = splice_set["target"]
+            # parse the target once, so that matching it against each concretized spec
+            # below does not re-parse the string
+            target = spack.spec.Spec(splice_set["target"])
             replacement = spack.spec.Spec(splice_set["replacement"])
 
             if not replacement.abstract_hash:
@@ -4005,20 +4276,30 @@ class SpecBuilder:
                 raise InvalidSpliceError(msg)
 
             transitive = splice_set.get("transitive", False)
-            splice_triples.append((target, replacement, transitive))
+            # a named, non-virtual target can only match a node with the same name, so
+            # record the name to skip non-matching specs without a full DAG check
+            target_name = None
+            if target.name and not spack.repo.PATH.is_virtual(target.name):
+                target_name = target.name
+            splice_triples.append((target, target_name, replacement, transitive))
 
         specs = {}
         for key, spec in self._specs.items():
             current_spec = spec
-            for target, replacement, transitive in splice_triples:
-                if target in current_spec:
-                    # matches root or non-root
-                    # e.g. mvapich2%gcc
-
-                    # The first iteration, we need to replace the abstract hash
-                    if not replacement.concrete:
-                        replacement.replace_hash()
-                    current_spec = current_spec.splice(replacement, transitive)
+            if splice_triples:
+                node_names = {s.name for s in current_spec.traverse()}
+                for target, target_name, replacement, transitive in splice_triples:
+                    if target_name is not None and target_name not in node_names:
+                        continue
+                    if target in current_spec:
+                        # matches root or non-root
+                        # e.g. mvapich2%gcc
+
+                        # The first iteration, we need to replace the abstract hash
+                        if not replacement.concrete:
+                            replacement.replace_hash()
+                        current_spec = current_spec.splice(replacement, transitive)
+                        node_names = {s.name for s in current_spec.traverse()}
             new_key = NodeArgument(id=key.id, pkg=current_spec.name)
             specs[new_key] = current_spec
 
@@ -4343,13 +4624,14 @@ class Solver:
     @staticmethod
     def _check_input_and_extract_concrete_specs(specs):
         reusable = []
-        for root in specs:
-            for s in root.traverse():
-                if s.virtual:
-                    continue
-                if s.concrete:
-                    reusable.append(s)
-                spack.spec.Spec.ensure_valid_variants(s)
+        # traverse all the roots at once, so nodes shared among several input
+        # specs are visited (and validated) a single time
+        for s in traverse.traverse_nodes(specs):
+            if s.virtual:
+                continue
+            if s.concrete:
+                reusable.append(s)
+            spack.spec.Spec.ensure_valid_variants(s)
         return reusable
 
     def solve_with_stats(
@@ -4379,8 +4661,26 @@ class Solver:
         specs = [s.lookup_hash() for s in specs]
         reusable_specs = self._check_input_and_extract_concrete_specs(specs)
         reusable_specs.extend(self.selector.reusable_specs(specs))
-        setup = SpackSolverSetup(tests=tests)
         output = OutputConfiguration(timers=timers, stats=stats, out=out, setup_only=setup_only)
+
+        # Optionally attempt a solve on a reduced universe of facts first, and fall
+        # back to the full universe if the reduced problem is unsatisfiable
+        if spack.config.get("concretizer:solve:preferred_first", False) and not setup_only:
+            try:
+                result, concretization_stats, clingo_stats = self.driver.solve(
+                    SpackSolverSetup(tests=tests, reduced=True),
+                    specs,
+                    reuse=reusable_specs,
+                    output=output,
+                    allow_deprecated=allow_deprecated,
+                )
+                if result.satisfiable:
+                    return result, concretization_stats, clingo_stats
+            except UnsatisfiableSpecError:
+                pass
+            tty.debug("SOLVER: reduced solve failed, retrying with the full universe")
+
+        setup = SpackSolverSetup(tests=tests)
         return self.driver.solve(
             setup, specs, reuse=reusable_specs, output=output, allow_deprecated=allow_deprecated
         )
@@ -4423,11 +4723,14 @@ class Solver:
 
         input_specs = specs
         output = OutputConfiguration(timers=timers, stats=stats, out=out, setup_only=False)
+        # key the reuse pool by dag hash, so nodes re-appearing in the results of
+        # later rounds are added a single time
+        reusable_by_hash = {s.dag_hash(): s for s in reusable_specs}
         while True:
             result, _, _ = self.driver.solve(
                 setup,
                 input_specs,
-                reuse=reusable_specs,
+                reuse=list(reusable_by_hash.values()),
                 output=output,
                 allow_deprecated=allow_deprecated,
             )
@@ -4446,9 +4749,11 @@ class Solver:
                     f" be solved for.\n\t{unsolved_str}"
                 )
 
-            input_specs = list(x for (x, y) in result.unsolved_specs)
-            for spec in result.specs:
-                reusable_specs.extend(spec.traverse())
+            input_specs = [x for (x, _) in result.unsolved_specs]
+            # traverse all the results at once, so nodes shared among several
+            # solved specs are visited a single time
+            for node in traverse.traverse_nodes(result.specs, key=traverse.by_dag_hash):
+                reusable_by_hash.setdefault(node.dag_hash(), node)
 
 
 class UnsatisfiableSpecError(spack.error.UnsatisfiableSpecError):
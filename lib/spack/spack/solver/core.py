@@ -31,6 +31,8 @@ ast_sym = _ast_getter("symbol", "term")
 class AspObject:
     """Object representing a piece of ASP code."""
 
+    __slots__ = ()
+
 
 def _id(thing: Any) -> Union[str, AspObject]:
     """Quote string if needed for it to be a valid identifier."""
@@ -48,6 +50,8 @@ class AspVar(AspObject):
     """Represents a variable in an ASP rule, allows for conditionally generating
     rules"""
 
+    __slots__ = ("name",)
+
     def __init__(self, name: str):
         self.name = name
 
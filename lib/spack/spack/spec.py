@@ -2754,6 +2754,35 @@ class Spec:
 
     @staticmethod
     def inject_patches_variant(root):
+        # Package classes resolved while walking the DAG; the same class is needed
+        # once per node and once per edge, and repo lookups are not free. The cache
+        # is local, so classes are not retained past this call.
+        pkg_classes = {}
+
+        def package_class(spec):
+            cls = pkg_classes.get(spec.fullname)
+            if cls is None:
+                cls = spack.repo.PATH.get_pkg_class(spec.fullname)
+                pkg_classes[spec.fullname] = cls
+            return cls
+
+        # Child names that appear with patches in a class' depends_on declarations,
+        # keyed by full name. Empty for most classes, which lets the edge loop below
+        # skip the per-condition satisfies checks entirely.
+        patched_dep_names: Dict[str, Set[str]] = {}
+
+        def patched_children(parent):
+            names = patched_dep_names.get(parent.fullname)
+            if names is None:
+                names = {
+                    dep_name
+                    for deps_by_name in package_class(parent).dependencies.values()
+                    for dep_name, dependency in deps_by_name.items()
+                    if dependency.patches
+                }
+                patched_dep_names[parent.fullname] = names
+            return names
+
         # This dictionary will store object IDs rather than Specs as keys
         # since the Spec __hash__ will change as patches are added to them
         spec_to_patches = {}
@@ -2772,9 +2801,13 @@ class Spec:
             if s.concrete:
                 continue
 
-            # Add any patches from the package to the spec.
+            # Add any patches from the package to the spec: most packages have none,
+            # so check that before evaluating any condition
+            pkg_patches = package_class(s).patches
+            if not pkg_patches:
+                continue
             patches = set()
-            for cond, patch_list in s.package_class.patches.items():
+            for cond, patch_list in pkg_patches.items():
                 if s.satisfies(cond):
                     for patch in patch_list:
                         patches.add(patch)
@@ -2787,7 +2820,10 @@ class Spec:
             if dspec.spec.concrete:
                 continue
 
-            pkg_deps = dspec.parent.package_class.dependencies
+            if dspec.spec.name not in patched_children(dspec.parent):
+                continue
+
+            pkg_deps = package_class(dspec.parent).dependencies
 
             patches = []
             for cond, deps_by_name in pkg_deps.items():
@@ -2812,16 +2848,29 @@ class Spec:
                 continue
 
             patches = list(lang.dedupe(spec_to_patches[id(spec)]))
-            mvar = spec.variants.setdefault("patches", vt.MultiValuedVariant("patches", ()))
-            mvar.value = tuple(p.sha256 for p in patches)
+            shas = tuple(p.sha256 for p in patches)
+            mvar = spec.variants.get("patches")
+            if mvar is None:
+                # constructing the variant with its final value validates it once,
+                # instead of once for the placeholder and once for the assignment
+                mvar = vt.MultiValuedVariant("patches", shas)
+                spec.variants["patches"] = mvar
+            else:
+                mvar.value = shas
             # FIXME: Monkey patches mvar to store patches order
-            full_order_keys = list(tuple(p.ordering_key) + (p.sha256,) for p in patches)
-            ordered_hashes = sorted(full_order_keys)
-            tty.debug(
-                "Ordered hashes [{0}]: ".format(spec.name)
-                + ", ".join("/".join(str(e) for e in t) for t in ordered_hashes)
+            # Sort on the ordering key only: the stable sort keeps ties in order of
+            # appearance, and the 64-character hashes never enter the comparisons
+            ordered_hashes = sorted(
+                ((tuple(p.ordering_key), p.sha256) for p in patches), key=lambda t: t[0]
             )
-            mvar._patches_in_order_of_appearance = list(t[-1] for t in ordered_hashes)
+            if tty.is_debug():
+                tty.debug(
+                    "Ordered hashes [{0}]: ".format(spec.name)
+                    + ", ".join(
+                        "/".join(str(e) for e in key + (sha,)) for key, sha in ordered_hashes
+                    )
+                )
+            mvar._patches_in_order_of_appearance = [sha for _, sha in ordered_hashes]
 
     @staticmethod
     def ensure_external_path_if_external(external_spec):
@@ -2969,7 +3018,18 @@ class Spec:
           3. Abstract specs will not have a `_package_hash` attribute at all.
 
         """
-        for spec in self.traverse():
+        Spec._finalize_concretization_of_nodes(list(self.traverse()))
+
+    @staticmethod
+    def _finalize_concretization_of_nodes(nodes: List["Spec"]) -> None:
+        """Assign hashes to the given nodes and mark them concrete.
+
+        The nodes must cover whole DAGs: callers pass either ``self.traverse()`` for
+        a single spec, or the deduplicated union of the nodes of several DAGs, so
+        that shared dependencies are finalized a single time. See
+        ``_finalize_concretization`` for the semantics of ``package_hash``.
+        """
+        for spec in nodes:
             # Already concrete specs either already have a package hash (new dag_hash())
             # or they never will b/c we can't know it (old dag_hash()). Skip them.
             #
@@ -2983,14 +3043,15 @@ class Spec:
                 # keep this check here to ensure package hash is saved
                 assert getattr(spec, ht.package_hash.attr)
 
-        # Mark everything in the spec as concrete
-        self._mark_concrete()
+        # Mark every node as concrete
+        for spec in nodes:
+            spec._mark_root_concrete()
 
         # Assign dag_hash (this *could* be done lazily, but it's assigned anyway in
         # ensure_no_deprecated, and it's clearer to see explicitly where it happens).
         # Any specs that were concrete before finalization will already have a cached
         # DAG hash.
-        for spec in self.traverse():
+        for spec in nodes:
             spec._cached_hash(ht.dag_hash)
 
     def concretized(self, tests: Union[bool, Iterable[str]] = False) -> "Spec":
@@ -1737,6 +1737,15 @@ class TestConcretize:
             with pytest.raises(spack.error.SpackError):
                 s.concretized()
 
+    def test_preferred_first_solve_strategy(self):
+        # With the "preferred_first" strategy the first solve considers only
+        # host compatible targets. Check that a request for "k10", which is not
+        # compatible with the test host, still succeeds via the fallback solve.
+        with spack.config.override("concretizer:solve", {"preferred_first": True}):
+            assert Spec("python").concretized()
+            s = Spec("python target=k10").concretized()
+        assert s.satisfies("target=k10")
+
     def test_add_microarchitectures_on_explicit_request(self):
         # Check that if we consider only "generic" targets, we can still solve for
         # specific microarchitectures on explicit requests